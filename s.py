@@ -1,15 +1,27 @@
 import os
 import sys
+import math
+import tempfile
+import ctypes
 import time
+import threading
 import random
+import logging
+import logging.handlers
 import psutil
-from enum import Enum, IntEnum
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple, Callable
 try:
     import GPUtil
 except ImportError:
     GPUtil = None
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
 from datetime import datetime
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
@@ -17,28 +29,35 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 
 
-class AnimationType(Enum):
-    """动画类型枚举"""
-    MAIN = "xiaoheichuchang2"
-    BLINK = "zhayan" 
-    ANGER = "shengqi"
-    WALK_AWAY = "zoukai"
-    SLEEP = "shuijiao"
-    HEIXIU = "heixiu"
-    HEIXIU_SLEEP = "heixiushuijiao"
-    DRINK_MILK = "henai"
-    CONFUSED = "yihuo"
-    EAT_BURGER = "chihanbao"
-    EAT_CHICKEN = "chijitui"
-    SHAKE = "yao"
-    ROLL = "gun1"
-    GUITAR = "tanjita"
-    PLAY_HEIXIU = "wanheixiu"
-    BURP = "dage1"
-    ANXIETY = "jiaolv"
-    LEFT_WALK = "left_walk"
-    RIGHT_WALK = "right_walk"
-    SIT = "sit"
+logger = logging.getLogger("pet")
+
+NS_PER_SEC = 1_000_000_000
+# 鼠标左键，提升为模块常量以省去每次事件对 Qt 属性的查找
+_LEFT = Qt.LeftButton
+
+
+class AnimationType(IntEnum):
+    """动画类型枚举（连续整数，可直接作为配置表下标）"""
+    MAIN = 0
+    BLINK = 1
+    ANGER = 2
+    WALK_AWAY = 3
+    SLEEP = 4
+    HEIXIU = 5
+    HEIXIU_SLEEP = 6
+    DRINK_MILK = 7
+    CONFUSED = 8
+    EAT_BURGER = 9
+    EAT_CHICKEN = 10
+    SHAKE = 11
+    ROLL = 12
+    GUITAR = 13
+    PLAY_HEIXIU = 14
+    BURP = 15
+    ANXIETY = 16
+    LEFT_WALK = 17
+    RIGHT_WALK = 18
+    SIT = 19
 
 
 class AnimationPriority(IntEnum):
@@ -51,9 +70,9 @@ class AnimationPriority(IntEnum):
     FORCE = 50        # 强制动画（不可被打断）
 
 
-@dataclass
+@dataclass(frozen=True)
 class AnimationConfig:
-    """动画配置"""
+    """动画配置（不可变）"""
     folder: str
     frames: int
     timer_interval: int = 33
@@ -66,8 +85,27 @@ class AnimationConfig:
     on_complete: Optional[Callable] = None  # 完成后回调
 
 
+def build_animation_table(configs: Dict[AnimationType, AnimationConfig]) -> Tuple[Optional[AnimationConfig], ...]:
+    """将动画配置整理为以 AnimationType 为下标的元组，未配置的类型为None"""
+    return tuple(configs.get(anim_type) for anim_type in AnimationType)
+
+
+# 单击随机动作：(累计概率上限, 动画类型)，按顺序取第一个满足 r < 上限 的动作
+_CLICK_TABLE = (
+    (0.10, AnimationType.SHAKE),
+    (0.20, AnimationType.CONFUSED),
+    (1.0, AnimationType.BLINK),
+)
+
+
 class AnimationState:
     """动画状态管理类"""
+    __slots__ = (
+        'current_animation', 'current_priority', 'is_playing', 'current_index',
+        'loop_count', 'start_time', 'direction', 'cached_frames', 'original_size',
+        'current_config', 'frame_count',
+    )
+    
     def __init__(self):
         self.current_animation = None
         self.current_priority = AnimationPriority.IDLE
@@ -76,8 +114,10 @@ class AnimationState:
         self.loop_count = 0
         self.start_time = 0
         self.direction = 1
-        self.cached_frames = None
+        self.cached_frames = None  # 当前动画的 FrameProvider
         self.original_size = None
+        self.current_config = None  # 当前动画配置，避免每帧查表
+        self.frame_count = 0        # 当前动画帧数
     
     def can_interrupt(self, new_priority: AnimationPriority) -> bool:
         """检查是否可以被新动画打断"""
@@ -93,23 +133,166 @@ class AnimationState:
         self.current_index = 0
         self.loop_count = 0
         self.cached_frames = None
+        self.current_config = None
+        self.frame_count = 0
+
+
+# PyInstaller创建临时文件夹，将路径存储在_MEIPASS中；开发环境下使用脚本所在目录
+_BASE_PATH = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
 
 
 def get_resource_path(relative_path: str) -> str:
     """获取资源文件路径，兼容PyInstaller打包"""
+    return os.path.join(_BASE_PATH, relative_path)
+
+
+def needs_smooth_scaling(source: QSize, target: QSize) -> bool:
+    """判断缩放是否需要平滑插值
+    
+    接近1:1或整数倍放大时，最近邻插值的效果与平滑插值相同且开销小得多；
+    缩小仍使用平滑插值以避免锯齿。
+    """
+    if source.width() <= 0 or target.width() <= 0:
+        return False
+    scale = target.width() / source.width()
+    if abs(scale - 1.0) < 0.05:
+        return False
+    return not (scale > 1.0 and scale.is_integer())
+
+
+def release_freed_memory():
+    """将已释放的堆内存归还给操作系统（仅glibc）"""
+    if not sys.platform.startswith('linux'):
+        return
     try:
-        # PyInstaller创建临时文件夹，将路径存储在_MEIPASS中
-        base_path = sys._MEIPASS
-    except Exception:
-        # 开发环境下使用脚本所在目录
-        base_path = os.path.dirname(os.path.abspath(__file__))
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class FrameProvider:
+    """动画帧序列 - 所有帧按需绘制到同一张图集（sprite atlas）中
     
-    return os.path.join(base_path, relative_path)
+    图集只包含已绘制到的行，随播放进度增长；帧绘制后不再保留原始图片。
+    """
+    
+    def __init__(self, folder: str, size: QSize, img_paths: List[str],
+                 loader: Callable[[str], Optional[QImage]]):
+        self.folder = folder
+        self.size = size
+        self.img_paths = img_paths
+        self.last_used = time.time()
+        self.atlas: Optional[QPixmap] = None  # 首次取帧时分配
+        # 按网格排布，避免单行图集超出平台位图的最大宽度
+        self.columns = max(1, math.ceil(math.sqrt(len(img_paths))))
+        self._loader = loader
+        self._loaded = [False] * len(img_paths)
+    
+    def __len__(self) -> int:
+        return len(self.img_paths)
+    
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self.img_paths)
+        if not 0 <= index < len(self.img_paths):
+            raise IndexError(index)
+        return index
+    
+    def frame_rect(self, index: int) -> QRect:
+        """获取第index帧在图集中的区域，首次访问时才解码绘制该帧"""
+        index = self._normalize_index(index)
+        row, column = divmod(index, self.columns)
+        w, h = self.size.width(), self.size.height()
+        rect = QRect(column * w, row * h, w, h)
+        if not self._loaded[index]:
+            self._paint_frame(index, rect)
+        return rect
+    
+    def _ensure_height(self, height: int):
+        """扩展图集高度，保留已绘制的帧"""
+        if self.atlas is not None and self.atlas.height() >= height:
+            return
+        atlas = QPixmap(self.columns * self.size.width(), height)
+        atlas.fill(Qt.transparent)
+        if self.atlas is not None:
+            painter = QPainter(atlas)
+            painter.drawPixmap(0, 0, self.atlas)
+            painter.end()
+        self.atlas = atlas
+    
+    def _paint_frame(self, index: int, rect: QRect):
+        """将一帧缩放后绘制到图集对应区域"""
+        self._ensure_height(rect.bottom() + 1)
+        
+        self._loaded[index] = True
+        image = self._loader(self.img_paths[index])
+        if image is None:
+            return
+        
+        # 保持宽高比并在格子内居中，与QLabel居中显示效果一致
+        target_size = image.size().scaled(self.size, Qt.KeepAspectRatio)
+        target_rect = QRect(
+            rect.x() + (rect.width() - target_size.width()) // 2,
+            rect.y() + (rect.height() - target_size.height()) // 2,
+            target_size.width(), target_size.height()
+        )
+        painter = QPainter(self.atlas)
+        if needs_smooth_scaling(image.size(), target_size):
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(target_rect, image, image.rect())
+        painter.end()
+    
+    def __getitem__(self, index: int) -> QPixmap:
+        rect = self.frame_rect(index)
+        return self.atlas.copy(rect)
+
+
+class AnimationLabel(QLabel):
+    """图像标签 - 支持直接从图集绘制动画帧，无需为每帧创建QPixmap"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._atlas: Optional[QPixmap] = None
+        self._source_rect = QRect()
+        self._frames: Optional[FrameProvider] = None
+        self._frame_index = -1
+        self._pixmap: Optional[QPixmap] = None
+    
+    def set_frame(self, frames: FrameProvider, index: int):
+        """显示帧序列中的第index帧，与当前显示相同时不重绘"""
+        if frames is self._frames and index == self._frame_index:
+            return
+        self._source_rect = frames.frame_rect(index)
+        self._atlas = frames.atlas
+        self._frames = frames
+        self._frame_index = index
+        self._pixmap = None
+        self.update()
+    
+    def setPixmap(self, pixmap: QPixmap):
+        if pixmap is self._pixmap:
+            return
+        self._atlas = None
+        self._frames = None
+        self._pixmap = pixmap
+        super().setPixmap(pixmap)
+    
+    def paintEvent(self, event):
+        if self._atlas is None:
+            super().paintEvent(event)
+            return
+        
+        target_rect = QRect(QPoint(0, 0), self._source_rect.size())
+        target_rect.moveCenter(self.rect().center())
+        painter = QPainter(self)
+        painter.drawPixmap(target_rect, self._atlas, self._source_rect)
+        painter.end()
 
 
 class ResourceManager:
     """资源管理器 - 支持PyInstaller打包和资源复用"""
     _instance = None
+    PREFETCH_FRAMES = 32  # 创建帧序列时预先并行解码的帧数
+    _resource_dirs: Dict[str, str] = {}  # 目录名 -> 资源目录路径
     
     def __new__(cls):
         """单例模式"""
@@ -122,45 +305,67 @@ class ResourceManager:
         if hasattr(self, '_initialized') and self._initialized:
             return
             
-        self.frame_cache: Dict[str, List[QPixmap]] = {}
-        self.image_cache: Dict[str, QPixmap] = {}
-        self.sound_cache: Dict[str, QMediaContent] = {}
-        self.base_pixmap_cache: Dict[str, QPixmap] = {}  # 原始尺寸缓存
+        self.frame_cache: Dict[Tuple, FrameProvider] = {}
+        self.image_cache: Dict[Tuple, QPixmap] = {}
+        self.sound_cache: Dict[Tuple, QMediaContent] = {}
+        self.base_image_cache: Dict[str, QImage] = {}  # 原始尺寸解码结果缓存
+        self._background_decodes = set()  # 已提交后台解码、结果尚未写入缓存的图片
+        self._decode_signals = set()      # 持有后台解码任务的信号对象直到任务完成
         self._initialized = True
     
-    def _get_cache_key(self, folder: str, filename: str = None, size: QSize = None) -> str:
-        """生成缓存键"""
-        key = folder
-        if filename:
-            key += f"/{filename}"
-        if size:
-            key += f"_{size.width()}x{size.height()}"
-        return key
-    
-    def load_frames(self, folder_name: str, total_frames: int, size: QSize) -> List[QPixmap]:
-        """加载动画帧并缓存"""
-        cache_key = self._get_cache_key(folder_name, size=size)
-        
-        if cache_key in self.frame_cache:
-            return self.frame_cache[cache_key]
-        
-        frames = []
-        resource_dir = get_resource_path(folder_name)
+    def _get_cache_key(self, folder: str, filename: str = None, size: QSize = None) -> Tuple:
+        """生成缓存键（元组哈希比拼接字符串更快）"""
+        if size is None:
+            return (folder, filename)
+        return (folder, filename, size.width(), size.height())
+    
+    @classmethod
+    def get_resource_dir(cls, folder_name: str) -> str:
+        """获取资源目录路径（按目录名缓存）"""
+        resource_dir = cls._resource_dirs.get(folder_name)
+        if resource_dir is None:
+            resource_dir = cls._resource_dirs[folder_name] = get_resource_path(folder_name)
+        return resource_dir
+    
+    def get_frame_paths(self, folder_name: str, total_frames: int) -> List[str]:
+        """获取动画帧文件路径列表"""
+        img_paths = []
+        resource_dir = self.get_resource_dir(folder_name)
         
-        if not os.path.exists(resource_dir):
-            print(f"警告: 资源目录不存在: {resource_dir}")
-            return frames
+        # 一次列出目录内容，避免逐帧调用 os.path.exists
+        try:
+            with os.scandir(resource_dir) as it:
+                entries = {entry.name: entry.path for entry in it if entry.is_file()}
+        except OSError:
+            logger.warning("资源目录不存在: %s", resource_dir)
+            return img_paths
         
         for i in range(1, total_frames + 1):
-            img_path = os.path.join(resource_dir, f'{i}.png')
+            filename = f'{i}.png'
+            img_path = entries.get(filename)
             
-            if os.path.exists(img_path):
-                pixmap = self._load_and_scale_pixmap(img_path, size)
-                if pixmap and not pixmap.isNull():
-                    frames.append(pixmap)
+            if img_path is not None:
+                img_paths.append(img_path)
             else:
-                print(f"警告: 图片文件不存在: {img_path}")
+                logger.warning("图片文件不存在: %s", os.path.join(resource_dir, filename))
+        
+        return img_paths
+    
+    def load_frames(self, folder_name: str, total_frames: int, size: QSize) -> FrameProvider:
+        """获取动画帧序列并缓存，帧在首次显示时才加载"""
+        cache_key = self._get_cache_key(folder_name, size=size)
         
+        if cache_key in self.frame_cache:
+            frames = self.frame_cache[cache_key]
+            frames.last_used = time.time()
+            return frames
+        
+        img_paths = self.get_frame_paths(folder_name, total_frames)
+        # 开头的一批帧立即并行解码，其余帧提交到后台解码，播放到时通常已在缓存中
+        self.decode_images(img_paths[:self.PREFETCH_FRAMES])
+        self.decode_in_background(img_paths[self.PREFETCH_FRAMES:])
+        
+        frames = FrameProvider(folder_name, size, img_paths, self.take_base_image)
         self.frame_cache[cache_key] = frames
         return frames
     
@@ -171,7 +376,7 @@ class ResourceManager:
         if cache_key in self.image_cache:
             return self.image_cache[cache_key]
         
-        resource_dir = get_resource_path(folder_name)
+        resource_dir = self.get_resource_dir(folder_name)
         img_path = os.path.join(resource_dir, filename)
         
         if os.path.exists(img_path):
@@ -180,33 +385,115 @@ class ResourceManager:
                 self.image_cache[cache_key] = pixmap
                 return pixmap
         else:
-            print(f"警告: 图片文件不存在: {img_path}")
+            logger.warning("图片文件不存在: %s", img_path)
         
         return None
     
+    @staticmethod
+    def _decode_image(img_path: str) -> Optional[QImage]:
+        """解码图片文件（QImage可在非GUI线程中使用）"""
+        image = QImage(img_path)
+        return None if image.isNull() else image
+    
+    def pending_images(self, img_paths: List[str]) -> List[str]:
+        """返回尚未解码的图片（按绝对路径去重）"""
+        pending = []
+        for img_path in img_paths:
+            base_key = os.path.realpath(img_path)
+            if base_key not in self.base_image_cache and base_key not in pending:
+                pending.append(base_key)
+        return pending
+    
+    @classmethod
+    def decode_batch(cls, img_paths: List[str]) -> Dict[str, Optional[QImage]]:
+        """并行解码一批图片，不访问缓存，可在后台线程中调用"""
+        if len(img_paths) <= 1:
+            return {img_path: cls._decode_image(img_path) for img_path in img_paths}
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            return dict(zip(img_paths, executor.map(cls._decode_image, img_paths)))
+    
+    def add_images(self, images: Dict[str, Optional[QImage]]):
+        """将解码结果写入原始图片缓存"""
+        for base_key, image in images.items():
+            if image is None:
+                logger.warning("无法加载图片: %s", base_key)
+            else:
+                self.base_image_cache[base_key] = image
+    
+    def decode_images(self, img_paths: List[str]):
+        """并行解码图片并写入原始图片缓存"""
+        pending = self.pending_images(img_paths)
+        if pending:
+            self.add_images(self.decode_batch(pending))
+    
+    def decode_in_background(self, img_paths: List[str]):
+        """在全局线程池中解码图片，完成后在主线程写入缓存"""
+        pending = [
+            base_key for base_key in self.pending_images(img_paths)
+            if base_key not in self._background_decodes
+        ]
+        if not pending:
+            return
+        
+        self._background_decodes.update(pending)
+        task = PreloadTask(pending)
+        signals = task.signals
+        self._decode_signals.add(signals)
+        signals.finished.connect(lambda images: self._on_background_decoded(signals, images))
+        QThreadPool.globalInstance().start(task)
+    
+    def _on_background_decoded(self, signals: QObject, images: Dict[str, Optional[QImage]]):
+        """写入后台解码结果，期间已同步解码或已释放的图片不再缓存"""
+        self._decode_signals.discard(signals)
+        wanted = {
+            base_key: image for base_key, image in images.items()
+            if base_key in self._background_decodes
+        }
+        self._background_decodes.difference_update(images)
+        self.add_images(wanted)
+    
+    def get_base_image(self, img_path: str) -> Optional[QImage]:
+        """获取原始尺寸图片，按绝对路径缓存，打包环境与开发环境共用同一份"""
+        base_key = os.path.realpath(img_path)
+        if base_key not in self.base_image_cache:
+            self.decode_images([base_key])
+        return self.base_image_cache.get(base_key)
+    
+    def take_base_image(self, img_path: str) -> Optional[QImage]:
+        """取出原始尺寸图片并从缓存移除，供只需绘制一次的动画帧使用"""
+        base_key = os.path.realpath(img_path)
+        image = self.base_image_cache.pop(base_key, None)
+        if image is None:
+            # 尚未解码完成时在主线程解码，后台结果到达后丢弃
+            self._background_decodes.discard(base_key)
+            image = self._decode_image(base_key)
+            if image is None:
+                logger.warning("无法加载图片: %s", base_key)
+        return image
+    
     def _load_and_scale_pixmap(self, img_path: str, size: QSize) -> Optional[QPixmap]:
         """加载并缩放图片，复用原始图片"""
         try:
-            # 检查原始图片缓存
-            if img_path not in self.base_pixmap_cache:
-                image = QImage(img_path)
-                if image.isNull():
-                    print(f"警告: 无法加载图片: {img_path}")
-                    return None
-                self.base_pixmap_cache[img_path] = QPixmap.fromImage(image)
-            
             # 从缓存的原始图片缩放
-            base_pixmap = self.base_pixmap_cache[img_path]
-            if base_pixmap.size() == size:
-                return base_pixmap
+            base_image = self.get_base_image(img_path)
+            if base_image is None:
+                return None
+            if base_image.size() == size:
+                return QPixmap.fromImage(base_image)
             
-            return base_pixmap.scaled(
-                size.width(), size.height(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            # 直接绘制到目标尺寸的位图上，避免 scaled() 的中间转换
+            target_size = base_image.size().scaled(size, Qt.KeepAspectRatio)
+            scaled = QPixmap(target_size)
+            scaled.fill(Qt.transparent)
+            painter = QPainter(scaled)
+            if needs_smooth_scaling(base_image.size(), target_size):
+                painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(scaled.rect(), base_image, base_image.rect())
+            painter.end()
+            return scaled
         except Exception as e:
-            print(f"错误: 加载图片时出错 {img_path}: {e}")
+            logger.error("加载图片时出错 %s: %s", img_path, e)
             return None
     
     def load_sound(self, folder_name: str, filename: str) -> Optional[QMediaContent]:
@@ -216,7 +503,7 @@ class ResourceManager:
         if cache_key in self.sound_cache:
             return self.sound_cache[cache_key]
         
-        resource_dir = get_resource_path(folder_name)
+        resource_dir = self.get_resource_dir(folder_name)
         sound_path = os.path.join(resource_dir, filename)
         
         if os.path.exists(sound_path):
@@ -225,88 +512,238 @@ class ResourceManager:
                 self.sound_cache[cache_key] = sound
                 return sound
             except Exception as e:
-                print(f"警告: 无法加载音频文件 {sound_path}: {e}")
+                logger.warning("无法加载音频文件 %s: %s", sound_path, e)
         else:
-            print(f"警告: 音频文件不存在: {sound_path}")
+            logger.warning("音频文件不存在: %s", sound_path)
         
         return None
     
-    def preload_resources(self, animations: Dict[AnimationType, AnimationConfig], default_size: QSize):
-        """预加载常用资源"""
+    def get_preload_paths(self, animations: Tuple[Optional[AnimationConfig], ...]) -> List[str]:
+        """获取需要预解码的常用资源路径"""
         # 预加载主要动画的第一帧
         priority_animations = [
             AnimationType.MAIN, AnimationType.BLINK, AnimationType.SLEEP,
             AnimationType.ANGER, AnimationType.ANXIETY
         ]
         
+        img_paths = []
         for anim_type in priority_animations:
-            if anim_type in animations:
-                config = animations[anim_type]
-                size = QSize(
-                    int(default_size.width() * config.size_scale),
-                    int(default_size.height() * config.size_scale)
-                )
-                # 只预加载第一帧以节省内存
-                frames = self.load_frames(config.folder, min(1, config.frames), size)
+            config = animations[anim_type]
+            if config is not None:
+                # 只预解码第一帧以节省内存，帧序列在使用时按实际尺寸创建
+                img_paths.extend(self.get_frame_paths(config.folder, min(1, config.frames)))
+        return img_paths
+    
+    def preload_sounds(self, animations: Tuple[Optional[AnimationConfig], ...]):
+        """预加载所有动画音效，避免首次播放时才访问磁盘"""
+        for config in animations:
+            if config is not None and config.has_sound and config.sound_file:
+                self.load_sound(config.folder, config.sound_file)
+    
+    def evict_stale_frames(self, max_age: float, keep_folders: Tuple[str, ...] = ()) -> int:
+        """清理长时间未使用的动画帧及其原始图片，返回清理的动画数"""
+        now = time.time()
+        return self._drop_frames([
+            key for key, frames in self.frame_cache.items()
+            if frames.folder not in keep_folders and now - frames.last_used > max_age
+        ])
+    
+    def release(self, folders: Tuple[str, ...]) -> int:
+        """释放指定动画目录的帧及其原始图片，返回释放的动画数"""
+        return self._drop_frames([
+            key for key, frames in self.frame_cache.items() if frames.folder in folders
+        ])
+    
+    def _drop_frames(self, keys: List[Tuple]) -> int:
+        """从缓存中移除指定的帧序列，并释放不再被引用的原始图片"""
+        if not keys:
+            return 0
+        
+        stale_paths = set()
+        for key in keys:
+            stale_paths.update(self.frame_cache.pop(key).img_paths)
+        
+        # 仍被其他尺寸的帧序列使用的原始图片需要保留
+        for frames in self.frame_cache.values():
+            stale_paths.difference_update(frames.img_paths)
+        for img_path in stale_paths:
+            base_key = os.path.realpath(img_path)
+            self.base_image_cache.pop(base_key, None)
+            self._background_decodes.discard(base_key)
+        
+        release_freed_memory()
+        return len(keys)
     
     def clear_cache(self):
         """清理缓存"""
         self.frame_cache.clear()
         self.image_cache.clear()
         self.sound_cache.clear()
-        self.base_pixmap_cache.clear()
+        self.base_image_cache.clear()
+        self._background_decodes.clear()
 
 
-class SystemMonitor:
+class GpuMonitorThread(QThread):
+    """GPU监控线程 - GPUtil会启动nvidia-smi子进程，放到后台执行避免阻塞界面"""
+    usage_updated = pyqtSignal(float)
+    
+    def __init__(self, interval: float, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self._paused = False
+        self._wakeup = threading.Event()
+    
+    def pause(self):
+        """暂停采样（窗口隐藏时不再启动nvidia-smi）"""
+        self._paused = True
+    
+    def resume(self):
+        """恢复采样"""
+        if self._paused:
+            self._paused = False
+            self._wakeup.set()
+    
+    def stop(self):
+        """请求退出并等待线程结束"""
+        self.requestInterruption()
+        self._wakeup.set()
+        self.wait()
+    
+    def run(self):
+        failing = False
+        while not self.isInterruptionRequested():
+            if self._paused:
+                # 暂停期间阻塞等待恢复或退出
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            
+            try:
+                gpus = GPUtil.getGPUs()
+                usage = gpus[0].load * 100 if gpus else 0.0
+            except Exception as e:
+                # 连续失败只记录第一次，之后降为调试级别，避免每次采样都写日志
+                logger.log(logging.DEBUG if failing else logging.WARNING, "获取GPU使用率失败: %s", e)
+                failing = True
+                usage = 0.0
+            else:
+                failing = False
+            self.usage_updated.emit(usage)
+            
+            # 等待下一次采样，恢复或退出请求会提前唤醒
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+class PreloadSignals(QObject):
+    """预加载任务信号"""
+    finished = pyqtSignal(object)
+
+
+class PreloadTask(QRunnable):
+    """后台预加载任务 - 只解码QImage，可在非GUI线程执行"""
+    def __init__(self, img_paths: List[str]):
+        super().__init__()
+        self.img_paths = img_paths
+        self.signals = PreloadSignals()
+    
+    def run(self):
+        try:
+            images = ResourceManager.decode_batch(self.img_paths)
+        except Exception as e:
+            logger.warning("预加载资源失败: %s", e)
+            images = {}
+        self.signals.finished.emit(images)
+
+
+class SystemMonitor(QObject):
     """系统监控类"""
-    def __init__(self):
+    def __init__(self, parent=None):
+        super().__init__(parent)
         self.gpu_usage_cache = 0.0
         self.cpu_usage_cache = 0.0
-        self.last_gpu_update = 0
         self.last_cpu_update = 0
         self.update_interval = 2.0
         
+        # 非阻塞采样返回的是距上次调用的增量，先调用一次作为基准
+        try:
+            psutil.cpu_percent(interval=None)
+        except Exception as e:
+            logger.warning("获取CPU使用率失败: %s", e)
+        
+        self._gpu_thread = None
+        if GPUtil:
+            self._gpu_thread = GpuMonitorThread(self.update_interval, self)
+            self._gpu_thread.usage_updated.connect(self._on_gpu_usage)
+            self._gpu_thread.start()
+        
     def get_cpu_usage(self) -> float:
         """获取CPU占用率"""
         current_time = time.time()
         
         if current_time - self.last_cpu_update > self.update_interval:
             try:
-                self.cpu_usage_cache = psutil.cpu_percent(interval=0.1)
+                self.cpu_usage_cache = psutil.cpu_percent(interval=None)
             except Exception as e:
-                print(f"获取CPU使用率失败: {e}")
+                logger.warning("获取CPU使用率失败: %s", e)
                 self.cpu_usage_cache = 0.0
             self.last_cpu_update = current_time
         
         return self.cpu_usage_cache
     
+    @pyqtSlot(float)
+    def _on_gpu_usage(self, usage: float):
+        """接收后台线程的GPU占用率"""
+        self.gpu_usage_cache = usage
+    
     def get_gpu_usage(self) -> float:
         """获取GPU占用率"""
-        if not GPUtil:
-            return 0.0
-            
-        current_time = time.time()
-        
-        if current_time - self.last_gpu_update > self.update_interval:
-            try:
-                gpus = GPUtil.getGPUs()
-                if gpus:
-                    self.gpu_usage_cache = gpus[0].load * 100
-                else:
-                    self.gpu_usage_cache = 0.0
-            except Exception as e:
-                print(f"获取GPU使用率失败: {e}")
-                self.gpu_usage_cache = 0.0
-            self.last_gpu_update = current_time
-        
         return self.gpu_usage_cache
+    
+    def pause(self):
+        """暂停后台采样"""
+        if self._gpu_thread is not None:
+            self._gpu_thread.pause()
+    
+    def resume(self):
+        """恢复后台采样"""
+        if self._gpu_thread is not None:
+            self._gpu_thread.resume()
+    
+    def stop(self):
+        """停止后台监控线程"""
+        if self._gpu_thread is not None:
+            self._gpu_thread.stop()
+            self._gpu_thread = None
 
 
 class DesktopPet(QWidget):
     tool_name = '桌面宠物'
     
+    # 常驻内存的动画，不参与过期清理
+    ALWAYS_HOT_ANIMATIONS = (AnimationType.MAIN, AnimationType.BLINK, AnimationType.SLEEP)
+    FRAME_EVICT_DELAY = 30000  # 动画结束后延迟清理（毫秒）
+    FRAME_MAX_IDLE = 60        # 超过该时长未使用的动画帧会被清理（秒）
+    
+    # 状态判断用的常量集合
+    _SLEEP_TYPES = frozenset({AnimationType.SLEEP, AnimationType.HEIXIU_SLEEP})
+    _EATING_TYPES = frozenset({AnimationType.DRINK_MILK, AnimationType.EAT_BURGER, AnimationType.EAT_CHICKEN})
+    _WALK_ACTIVITIES = frozenset({'left_walk', 'right_walk'})
+    
+    # 鼠标事件处理中使用的常量，避免每次事件查找全局名称
+    _A_HEIXIU = AnimationType.HEIXIU
+    # 仅能从互动菜单触发的动画，嘿咻模式下菜单隐藏，不会播放
+    _INTERACTION_ANIMATIONS = (
+        AnimationType.DRINK_MILK, AnimationType.EAT_BURGER, AnimationType.EAT_CHICKEN,
+        AnimationType.ROLL, AnimationType.GUITAR, AnimationType.PLAY_HEIXIU,
+    )
+    
+    TICK_INTERVAL = 33         # 主节拍间隔（毫秒）
+    STATUS_TICKS = 90          # 约3秒更新一次状态
+    IDLE_CHECK_TICKS = 1818    # 约1分钟检查一次空闲
+    
     # 动画配置 - 统一管理所有动画参数
-    ANIMATIONS = {
+    ANIMATIONS = build_animation_table({
         AnimationType.MAIN: AnimationConfig(
             "xiaoheichuchang2", 34, 100, 1, False, None,
             AnimationPriority.IDLE, True
@@ -379,22 +816,28 @@ class DesktopPet(QWidget):
             "sit", 1, 100, -1, False, None,
             AnimationPriority.SPECIAL, True
         ),
-    }
+    })
     
     def __init__(self, parent=None, **kwargs):
         super().__init__(parent)
         
         # 初始化核心组件
         self.resource_manager = ResourceManager()
-        self.system_monitor = SystemMonitor()
+        self.system_monitor = SystemMonitor(self)
         self.animation_state = AnimationState()
         
         # 核心属性
+        self._rand = random.random
+        self._now = time.monotonic_ns
         self.original_size = QSize(200, 200)
+        self._orig_w, self._orig_h = self.original_size.width(), self.original_size.height()
         self.is_heixiu_mode = False
         self.is_force_sleeping = False
-        self.last_interaction_time = time.time()
-        self.click_timestamps = []
+        self.last_interaction_time = self._now()
+        self.click_timestamps = deque(maxlen=15)
+        self._frame_eviction_scheduled = False
+        self._last_status = None
+        self._walk_frames_cache: Dict[Tuple[AnimationType, int, int], FrameProvider] = {}
         
         # 自由活动相关
         self.free_active_type = None
@@ -405,20 +848,36 @@ class DesktopPet(QWidget):
         # 拖拽相关
         self.drag_position = None
         self.mouse_press_pos = None
-        
-        # 初始化组件
+        self._pending_move_pos = None
+        self._move_pending = False
+        self._frame_top_left = None
+        self._move = self.move
+        
+        # 基础资源在后台预加载完成后填充
+        self.main_frames = None
+        self._first_frame: Optional[QPixmap] = None
+        self._last_frame: Optional[QPixmap] = None
+        self.sleep_image = None
+        self.heixiu_sleep_image = None
+        self._fallback_main_pix = None
+        self._fallback_sleep_pix = None
+        self._menu_default = None
+        self._menu_free_active = None
+        
+        # 初始化组件，先显示占位图像，资源在后台解码
         try:
             self._setup_window()
+            self._setup_screen_geometry()
             self._setup_ui()
-            self.resource_manager.preload_resources(self.ANIMATIONS, self.original_size)
-            self._load_basic_resources()
+            self._show_placeholder()
+            self.show()
             self._setup_timers()
             self._setup_media_player()
+            self._create_context_menu()
+            self._start_preload()
         except Exception as e:
-            print(f"初始化失败: {e}")
+            logger.warning("初始化失败: %s", e)
             return
-        
-        self.show()
     
     def _setup_window(self):
         """设置窗口属性"""
@@ -430,7 +889,7 @@ class DesktopPet(QWidget):
     def _setup_ui(self):
         """设置UI组件"""
         # 主图像标签
-        self.image_label = QLabel(self)
+        self.image_label = AnimationLabel(self)
         self.image_label.setGeometry(0, 0, self.original_size.width(), self.original_size.height())
         self.image_label.setAlignment(Qt.AlignCenter)
         
@@ -456,13 +915,57 @@ class DesktopPet(QWidget):
         try:
             self.media_player = QMediaPlayer(self)
         except Exception as e:
-            print(f"媒体播放器初始化失败: {e}")
+            logger.warning("媒体播放器初始化失败: %s", e)
             self.media_player = None
     
+    def _render_text_pixmap(self, background, text: str) -> QPixmap:
+        """绘制带文字的替代图像"""
+        pixmap = QPixmap(self.original_size)
+        pixmap.fill(background)
+        painter = QPainter(pixmap)
+        painter.setPen(Qt.white)
+        painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
+        painter.end()
+        return pixmap
+    
+    def _show_placeholder(self):
+        """显示默认的占位图像（只绘制一次，之后复用）"""
+        if self._fallback_main_pix is None:
+            self._fallback_main_pix = self._render_text_pixmap(Qt.blue, "桌面宠物")
+        self.image_label.setPixmap(self._fallback_main_pix)
+    
+    def _start_preload(self):
+        """在线程池中解码主动画和常用资源"""
+        main_config = self.ANIMATIONS[AnimationType.MAIN]
+        img_paths = self.resource_manager.get_preload_paths(self.ANIMATIONS)
+        img_paths += self.resource_manager.get_frame_paths(main_config.folder, main_config.frames)
+        img_paths += [
+            os.path.join(self.resource_manager.get_resource_dir(folder), "1.png")
+            for folder in ("shuijiao", "heixiushuijiao")
+        ]
+        
+        task = PreloadTask(self.resource_manager.pending_images(img_paths))
+        self._preload_signals = task.signals
+        self._preload_signals.finished.connect(self._on_preload_finished)
+        QThreadPool.globalInstance().start(task)
+    
+    def _on_preload_finished(self, images: Dict[str, Optional[QImage]]):
+        """预加载完成 - 在主线程中写入缓存并替换占位图像"""
+        self.resource_manager.add_images(images)
+        self.resource_manager.preload_sounds(self.ANIMATIONS)
+        self._load_basic_resources()
+        
+        if not self.main_frames:
+            logger.warning("未能加载主要资源文件，请检查资源目录")
+    
     def _load_basic_resources(self):
         """加载基础资源"""
-        # 加载主动画帧
-        self.main_frames = self._get_animation_frames(AnimationType.MAIN)
+        # 加载主动画帧（按原始尺寸，加载期间开始的缩放动画不影响主动画）
+        self.main_frames = self._get_animation_frames(AnimationType.MAIN, self.original_size)
+        # 缓存首尾帧，静止显示时直接使用
+        if self.main_frames:
+            self._first_frame = self.main_frames[0]
+            self._last_frame = self.main_frames[-1]
         
         # 加载睡觉图像
         self.sleep_image = self.resource_manager.load_single_image(
@@ -472,26 +975,23 @@ class DesktopPet(QWidget):
             "heixiushuijiao", "1.png", self.original_size
         )
         
-        # 显示第一帧或创建默认图像
-        if self.main_frames:
-            self.image_label.setPixmap(self.main_frames[0])
-        else:
-            # 如果没有加载到图片，创建一个默认的占位图像
-            pixmap = QPixmap(self.original_size)
-            pixmap.fill(Qt.blue)
-            painter = QPainter(pixmap)
-            painter.setPen(Qt.white)
-            painter.drawText(pixmap.rect(), Qt.AlignCenter, "桌面宠物")
-            painter.end()
-            self.image_label.setPixmap(pixmap)
-    
-    def _get_animation_frames(self, animation_type: AnimationType) -> List[QPixmap]:
-        """获取动画帧"""
-        if animation_type not in self.ANIMATIONS:
-            return []
+        # 没有睡眠图像时预先绘制文字替代图像
+        if self.sleep_image is None and self._fallback_sleep_pix is None:
+            self._fallback_sleep_pix = self._render_text_pixmap(Qt.transparent, "💤")
         
+        # 用第一帧替换占位图像（加载期间已开始的动画不受影响）
+        if (self._first_frame is not None and not self.animation_state.is_playing
+                and not self._is_in_special_state()):
+            self.image_label.setPixmap(self._first_frame)
+    
+    def _get_animation_frames(self, animation_type: AnimationType,
+                              base_size: Optional[QSize] = None) -> Optional[FrameProvider]:
+        """获取动画帧，base_size 默认为当前窗口尺寸"""
         config = self.ANIMATIONS[animation_type]
-        current_size = self.size()
+        if config is None:
+            return None
+        
+        current_size = base_size if base_size is not None else self.size()
         
         # 应用尺寸缩放
         scaled_size = QSize(
@@ -504,36 +1004,43 @@ class DesktopPet(QWidget):
         )
     
     def _setup_timers(self):
-        """设置定时器"""
-        # 主定时器 - 处理空闲状态和背景动画
-        self.main_timer = QTimer(self)
-        self.main_timer.timeout.connect(self._on_main_timer)
-        self.main_timer.start(100)
+        """设置定时器 - 所有周期任务共用一个主节拍，按节拍数分频调度"""
+        self._tick = 0
+        self._main_ticks = self._ticks_for(100)      # 空闲状态和背景动画
+        self._animation_ticks = 0                    # 动画更新，0表示停止
+        self._free_active_ticks = 0                  # 自由活动，0表示停止
         
-        # 动画更新定时器
+        # CoarseTimer 允许系统合并唤醒，避免 Windows 下提高全局定时器精度
         self.animation_timer = QTimer(self)
-        self.animation_timer.timeout.connect(self._update_current_animation)
-        
-        # 自由活动定时器
-        self.free_active_timer = QTimer(self)
-        self.free_active_timer.timeout.connect(self._update_free_active)
-        
-        # 状态更新定时器
-        self.status_timer = QTimer(self)
-        self.status_timer.timeout.connect(self._update_status)
-        self.status_timer.start(3000)  # 3秒更新一次
-        
-        # 空闲检测定时器
-        self.idle_timer = QTimer(self)
-        self.idle_timer.timeout.connect(self._check_idle_time)
-        self.idle_timer.start(60000)  # 1分钟检查一次
+        self.animation_timer.setTimerType(Qt.CoarseTimer)
+        self.animation_timer.timeout.connect(self._on_tick)
+        self._restart_timer(self.animation_timer, self.TICK_INTERVAL)
+    
+    def _ticks_for(self, interval: int) -> int:
+        """将毫秒间隔换算为主节拍数"""
+        return max(1, round(interval / self.TICK_INTERVAL))
+    
+    def _on_tick(self):
+        """主节拍处理 - 分发到各个周期任务"""
+        self._tick += 1
+        tick = self._tick
+        
+        if self._animation_ticks and tick % self._animation_ticks == 0:
+            self._update_current_animation()
+        if self._free_active_ticks and tick % self._free_active_ticks == 0:
+            self._update_free_active()
+        if tick % self._main_ticks == 0:
+            self._on_main_timer()
+        if tick % self.STATUS_TICKS == 0:
+            self._update_status()
+        if tick % self.IDLE_CHECK_TICKS == 0:
+            self._check_idle_time()
     
     def _start_animation(self, animation_type: AnimationType, force: bool = False) -> bool:
         """启动动画 - 改进的打断逻辑"""
-        if animation_type not in self.ANIMATIONS:
-            return False
-        
         config = self.ANIMATIONS[animation_type]
+        if config is None:
+            return False
         
         # 检查是否可以打断当前动画
         if not force and not self.animation_state.can_interrupt(config.priority):
@@ -545,7 +1052,7 @@ class DesktopPet(QWidget):
         # 获取动画帧
         frames = self._get_animation_frames(animation_type)
         if not frames:
-            print(f"警告: 无法加载动画帧 {animation_type}")
+            logger.warning("无法加载动画帧 %s", animation_type)
             return False
         
         # 设置动画状态
@@ -556,6 +1063,8 @@ class DesktopPet(QWidget):
         self.animation_state.loop_count = 0
         self.animation_state.start_time = time.time()
         self.animation_state.cached_frames = frames
+        self.animation_state.current_config = config
+        self.animation_state.frame_count = len(frames)
         
         # 调整窗口大小（如果需要）
         if config.size_scale != 1.0:
@@ -568,7 +1077,7 @@ class DesktopPet(QWidget):
             self.image_label.setGeometry(0, 0, new_size.width(), new_size.height())
         
         # 显示第一帧
-        self.image_label.setPixmap(frames[0])
+        self.image_label.set_frame(frames, 0)
         
         # 播放音频
         if config.has_sound and config.sound_file and self.media_player:
@@ -578,24 +1087,24 @@ class DesktopPet(QWidget):
                     self.media_player.setMedia(sound)
                     self.media_player.play()
                 except Exception as e:
-                    print(f"播放音频失败: {e}")
+                    logger.warning("播放音频失败: %s", e)
         
         # 启动动画定时器
-        self.animation_timer.start(config.timer_interval)
+        self._animation_ticks = self._ticks_for(config.timer_interval)
         
         return True
     
     def _stop_current_animation(self):
         """停止当前动画"""
-        self.animation_timer.stop()
-        self.free_active_timer.stop()
+        self._animation_ticks = 0
+        self._free_active_ticks = 0
         
         # 停止音频
         if self.media_player and self.media_player.state() == QMediaPlayer.PlayingState:
             try:
                 self.media_player.stop()
             except Exception as e:
-                print(f"停止音频失败: {e}")
+                logger.warning("停止音频失败: %s", e)
         
         # 恢复窗口大小
         if self.animation_state.original_size:
@@ -605,6 +1114,25 @@ class DesktopPet(QWidget):
                 self.animation_state.original_size.height())
             self.animation_state.original_size = None
     
+    def _reset_to_idle(self, frame_index: int = -1):
+        """停止动画、重置状态、恢复原始尺寸并显示主动画的首帧(0)或尾帧(-1)"""
+        self._stop_current_animation()
+        self.animation_state.reset()
+        
+        if self.size() != self.original_size:
+            self.resize(self.original_size)
+            self.image_label.setGeometry(0, 0, self._orig_w, self._orig_h)
+        
+        still_frame = self._first_frame if frame_index == 0 else self._last_frame
+        if still_frame is not None:
+            self.image_label.setPixmap(still_frame)
+    
+    def _clear_modes(self):
+        """退出嘿咻模式和自由活动，并记录交互时间"""
+        self.is_heixiu_mode = False
+        self.free_active_type = None
+        self.last_interaction_time = self._now()
+    
     def _on_main_timer(self):
         """主定时器处理 - 空闲状态和背景动画"""
         # 如果有活跃动画，不处理背景动画
@@ -612,30 +1140,28 @@ class DesktopPet(QWidget):
             return
         
         # 随机眨眼
-        if random.randint(1, 1000) <= 5:  # 0.5%概率眨眼
+        if self._rand() < 0.005:  # 0.5%概率眨眼
             self._start_animation(AnimationType.BLINK)
     
     def _update_current_animation(self):
         """更新当前动画"""
-        if not self.animation_state.is_playing or not self.animation_state.cached_frames:
+        state = self.animation_state
+        if not state.is_playing or not state.frame_count:
             return
         
-        config = self.ANIMATIONS[self.animation_state.current_animation]
-        frames = self.animation_state.cached_frames
-        
         # 显示当前帧
-        if self.animation_state.current_index < len(frames):
-            self.image_label.setPixmap(frames[self.animation_state.current_index])
-            self.animation_state.current_index += 1
+        index = state.current_index
+        if index < state.frame_count:
+            self.image_label.set_frame(state.cached_frames, index)
+            state.current_index = index + 1
         else:
             # 处理循环
-            if config.loops == -1:  # 无限循环
-                self.animation_state.current_index = 0
-            else:
-                self.animation_state.current_index = 0
-                self.animation_state.loop_count += 1
+            state.current_index = 0
+            loops = state.current_config.loops
+            if loops != -1:  # -1表示无限循环
+                state.loop_count += 1
                 
-                if self.animation_state.loop_count >= config.loops:
+                if state.loop_count >= loops:
                     self._end_current_animation()
     
     def _end_current_animation(self):
@@ -643,38 +1169,58 @@ class DesktopPet(QWidget):
         current_type = self.animation_state.current_animation
         
         # 执行完成回调
-        if current_type in self.ANIMATIONS:
-            config = self.ANIMATIONS[current_type]
+        config = self.ANIMATIONS[current_type] if current_type is not None else None
+        if config is not None:
             if config.on_complete:
                 try:
                     config.on_complete()
                 except Exception as e:
-                    print(f"动画完成回调执行失败: {e}")
+                    logger.warning("动画完成回调执行失败: %s", e)
         
         # 特殊处理某些动画的后续动作
         if current_type == AnimationType.ANGER:
             self._start_animation(AnimationType.WALK_AWAY, force=True)
             return
-        elif current_type in [AnimationType.DRINK_MILK, AnimationType.EAT_BURGER, AnimationType.EAT_CHICKEN]:
-            if random.randint(1, 100) <= 30:  # 30%概率打嗝
+        elif current_type in self._EATING_TYPES:
+            if self._rand() < 0.30:  # 30%概率打嗝
                 self._start_animation(AnimationType.BURP, force=True)
                 return
         
-        # 停止动画
-        self._stop_current_animation()
-        self.animation_state.reset()
+        # 停止动画并显示静止帧
+        self._reset_to_idle(frame_index=-1)
         
-        # 显示静止帧
-        if self.main_frames:
-            self.image_label.setPixmap(self.main_frames[-1])
+        self._schedule_frame_eviction()
+    
+    def _schedule_frame_eviction(self):
+        """延迟清理长时间未使用的动画帧"""
+        if self._frame_eviction_scheduled:
+            return
+        self._frame_eviction_scheduled = True
+        QTimer.singleShot(self.FRAME_EVICT_DELAY, self._evict_stale_frames)
+    
+    def _folders_of(self, anim_types) -> Tuple[str, ...]:
+        """获取动画类型对应的资源目录（没有配置的类型忽略）"""
+        configs = (self.ANIMATIONS[anim_type] for anim_type in anim_types)
+        return tuple(config.folder for config in configs if config is not None)
+    
+    def _evict_stale_frames(self):
+        """清理过期动画帧，保留常驻动画和当前动画"""
+        self._frame_eviction_scheduled = False
+        keep_types = list(self.ALWAYS_HOT_ANIMATIONS)
+        if self.animation_state.current_animation is not None:
+            keep_types.append(self.animation_state.current_animation)
+        keep_folders = self._folders_of(keep_types)
+        # 自由活动帧在本地缓存中使用，不会刷新使用时间，需要单独保留
+        if self.free_active_type:
+            keep_folders += tuple(frames.folder for frames in self._walk_frames_cache.values() if frames)
+        if self.resource_manager.evict_stale_frames(self.FRAME_MAX_IDLE, keep_folders):
+            self._walk_frames_cache.clear()
     
     def _is_in_special_state(self) -> bool:
         """检查是否在特殊状态"""
         return (self.is_force_sleeping or 
                 self.free_active_type is not None or
-                self.animation_state.current_animation in [
-                    AnimationType.SLEEP, AnimationType.HEIXIU_SLEEP
-                ])
+                self.animation_state.current_animation in self._SLEEP_TYPES)
     
     def _update_free_active(self):
         """更新自由活动"""
@@ -683,40 +1229,62 @@ class DesktopPet(QWidget):
         
         # 检查持续时间
         if (self.free_active_duration > 0 and 
-            time.time() - self.free_active_start_time > self.free_active_duration):
+            self._now() - self.free_active_start_time > self.free_active_duration * NS_PER_SEC):
             self._end_free_active()
             return
         
         # 更新动画
-        if self.free_active_type in ['left_walk', 'right_walk']:
+        if self.free_active_type in self._WALK_ACTIVITIES:
             self._update_walk_animation()
             self._move_window_horizontally(self.free_active_direction * 5)
         elif self.free_active_type == 'sit':
-            frames = self._get_animation_frames(AnimationType.SIT)
+            frames = self._get_walk_frames(AnimationType.SIT)
             if frames:
-                self.image_label.setPixmap(frames[0])
+                self.image_label.set_frame(frames, 0)
     
     def _update_walk_animation(self):
         """更新行走动画"""
         animation_type = (AnimationType.LEFT_WALK if self.free_active_type == 'left_walk' 
                          else AnimationType.RIGHT_WALK)
-        frames = self._get_animation_frames(animation_type)
+        frames = self._get_walk_frames(animation_type)
         
         if frames:
             frame_index = self.animation_state.current_index % len(frames)
-            self.image_label.setPixmap(frames[frame_index])
+            self.image_label.set_frame(frames, frame_index)
             self.animation_state.current_index += 1
     
+    def _get_walk_frames(self, animation_type: AnimationType) -> Optional[FrameProvider]:
+        """获取自由活动帧，按动画类型和窗口尺寸缓存，避免每个节拍重复计算"""
+        key = (animation_type, self.width(), self.height())
+        frames = self._walk_frames_cache.get(key)
+        if frames is None:
+            frames = self._get_animation_frames(animation_type)
+            self._walk_frames_cache[key] = frames
+        return frames
+    
+    def _setup_screen_geometry(self):
+        """缓存屏幕可用区域，屏幕变化时刷新"""
+        self._refresh_screen_geometry()
+        app = QApplication.instance()
+        app.primaryScreenChanged.connect(self._refresh_screen_geometry)
+        app.screenAdded.connect(self._refresh_screen_geometry)
+        app.screenRemoved.connect(self._refresh_screen_geometry)
+        QApplication.desktop().workAreaResized.connect(self._refresh_screen_geometry)
+    
+    def _refresh_screen_geometry(self, *args):
+        """刷新缓存的屏幕可用区域"""
+        try:
+            self._screen_geometry = QApplication.desktop().availableGeometry()
+        except Exception:
+            # 如果获取屏幕几何信息失败，使用默认值
+            self._screen_geometry = QRect(0, 0, 1920, 1080)
+    
     def _move_window_horizontally(self, step: int):
         """水平移动窗口"""
         current_pos = self.pos()
         new_x = current_pos.x() + step
         
-        try:
-            screen_geometry = QApplication.desktop().availableGeometry()
-        except Exception:
-            # 如果获取屏幕几何信息失败，使用默认值
-            screen_geometry = QRect(0, 0, 1920, 1080)
+        screen_geometry = self._screen_geometry
         
         # 边界检测和方向反转
         if new_x < screen_geometry.left():
@@ -741,24 +1309,28 @@ class DesktopPet(QWidget):
     
     def _end_free_active(self):
         """结束自由活动"""
-        self.free_active_timer.stop()
+        self._free_active_ticks = 0
         self.free_active_type = None
         self.animation_state.current_index = 0
         
-        if self.main_frames:
-            self.image_label.setPixmap(self.main_frames[-1])
+        if self._last_frame is not None:
+            self.image_label.setPixmap(self._last_frame)
     
     def _update_status(self):
         """更新状态信息"""
         try:
-            current_time_str = datetime.now().strftime("%H:%M")
+            now = datetime.now()
             cpu_usage = self.system_monitor.get_cpu_usage()
             gpu_usage = self.system_monitor.get_gpu_usage()
             
-            self.status_label.setText(f"{current_time_str}|CPU:{cpu_usage:.1f}%|GPU:{gpu_usage:.1f}%")
+            # 显示内容只在分钟或占用率变化时才更新
+            status = (now.hour, now.minute, round(cpu_usage, 1), round(gpu_usage, 1))
+            if status != self._last_status:
+                self._last_status = status
+                self.status_label.setText(f"{now:%H:%M}|CPU:{cpu_usage:.1f}%|GPU:{gpu_usage:.1f}%")
             
             # 检查凌晨1点强制睡眠
-            hour = datetime.now().hour
+            hour = now.hour
             if hour == 1 and not self.is_force_sleeping:
                 self._enter_force_sleep()
             elif hour != 1 and self.is_force_sleeping:
@@ -773,20 +1345,20 @@ class DesktopPet(QWidget):
             elif not is_high_usage and is_currently_anxious:
                 self._end_current_animation()
         except Exception as e:
-            print(f"更新状态失败: {e}")
+            logger.warning("更新状态失败: %s", e)
     
     def _check_idle_time(self):
         """检查空闲时间"""
         try:
-            idle_seconds = time.time() - self.last_interaction_time
+            idle_ns = self._now() - self.last_interaction_time
             
-            if idle_seconds > 600:  # 10分钟
+            if idle_ns > 600 * NS_PER_SEC:  # 10分钟
                 if self.is_heixiu_mode and not self._is_sleeping():
                     self._enter_heixiu_sleep()
                 elif not self._is_sleeping() and not self.is_force_sleeping:
                     self._enter_sleep()
         except Exception as e:
-            print(f"检查空闲时间失败: {e}")
+            logger.warning("检查空闲时间失败: %s", e)
     
     def _enter_sleep(self):
         """进入睡眠状态"""
@@ -800,14 +1372,10 @@ class DesktopPet(QWidget):
         if self.sleep_image:
             self.image_label.setPixmap(self.sleep_image)
         else:
-            # 如果没有睡眠图像，显示文字
-            pixmap = QPixmap(self.size())
-            pixmap.fill(Qt.transparent)
-            painter = QPainter(pixmap)
-            painter.setPen(Qt.white)
-            painter.drawText(pixmap.rect(), Qt.AlignCenter, "💤")
-            painter.end()
-            self.image_label.setPixmap(pixmap)
+            # 如果没有睡眠图像，显示预先绘制的文字
+            if self._fallback_sleep_pix is None:
+                self._fallback_sleep_pix = self._render_text_pixmap(Qt.transparent, "💤")
+            self.image_label.setPixmap(self._fallback_sleep_pix)
     
     def _enter_heixiu_sleep(self):
         """进入嘿咻睡眠状态"""
@@ -835,14 +1403,12 @@ class DesktopPet(QWidget):
         self.animation_state.reset()
         self.sleep_hint_label.hide()
         
-        if self.main_frames:
-            self.image_label.setPixmap(self.main_frames[-1])
+        if self._last_frame is not None:
+            self.image_label.setPixmap(self._last_frame)
     
     def _is_sleeping(self) -> bool:
         """检查是否在睡眠状态"""
-        return self.animation_state.current_animation in [
-            AnimationType.SLEEP, AnimationType.HEIXIU_SLEEP
-        ]
+        return self.animation_state.current_animation in self._SLEEP_TYPES
     
     def _wake_up(self):
         """唤醒"""
@@ -850,15 +1416,16 @@ class DesktopPet(QWidget):
             return
         
         self.animation_state.reset()
-        if self.main_frames:
-            self.image_label.setPixmap(self.main_frames[-1])
+        if self._last_frame is not None:
+            self.image_label.setPixmap(self._last_frame)
     
     def _check_anger_condition(self):
         """检查生气条件"""
-        current_time = time.time()
-        # 清理超过10秒的点击记录
-        self.click_timestamps = [t for t in self.click_timestamps if current_time - t <= 10]
+        current_time = self._now()
         self.click_timestamps.append(current_time)
+        # 清理超过10秒的点击记录（按时间顺序，只需检查队首）
+        while self.click_timestamps and current_time - self.click_timestamps[0] > 10 * NS_PER_SEC:
+            self.click_timestamps.popleft()
         
         # 10秒内点击超过15次触发生气
         if len(self.click_timestamps) >= 15:
@@ -874,15 +1441,15 @@ class DesktopPet(QWidget):
             self._stop_current_animation()
             self.animation_state.reset()
             self.animation_state.current_index = 0
-            self.free_active_start_time = time.time()
+            self.free_active_start_time = self._now()
             
             # 随机选择活动类型
-            rand_val = random.randint(1, 100)
-            if rand_val <= 48:
+            r = self._rand()
+            if r < 0.48:
                 self.free_active_type = 'left_walk'
                 self.free_active_direction = -1
                 self.free_active_duration = 0
-            elif rand_val <= 96:
+            elif r < 0.96:
                 self.free_active_type = 'right_walk'
                 self.free_active_direction = 1
                 self.free_active_duration = 0
@@ -890,31 +1457,35 @@ class DesktopPet(QWidget):
                 self.free_active_type = 'sit'
                 self.free_active_duration = 300  # 5分钟
             
-            self.free_active_timer.start(33)
+            self._free_active_ticks = self._ticks_for(33)
         except Exception as e:
-            print(f"开始自由活动失败: {e}")
+            logger.warning("开始自由活动失败: %s", e)
     
     def toggle_heixiu_mode(self):
         """切换嘿咻模式"""
+        self.set_heixiu_mode(not self.is_heixiu_mode)
+    
+    def set_heixiu_mode(self, enabled: bool):
+        """开启或关闭嘿咻模式，已处于目标模式时不做任何事"""
+        if enabled == self.is_heixiu_mode:
+            return
+        
         try:
-            self.is_heixiu_mode = not self.is_heixiu_mode
+            self.is_heixiu_mode = enabled
             
             if self.is_heixiu_mode:
                 # 启动嘿咻动画
                 self._start_animation(AnimationType.HEIXIU, force=True)
+                released = self._folders_of(self._INTERACTION_ANIMATIONS)
             else:
                 # 退出嘿咻模式
-                self._stop_current_animation()
-                self.animation_state.reset()
-                
-                # 恢复原始大小
-                self.resize(self.original_size)
-                self.image_label.setGeometry(0, 0, self.original_size.width(), self.original_size.height())
-                
-                if self.main_frames:
-                    self.image_label.setPixmap(self.main_frames[-1])
+                self._reset_to_idle(frame_index=-1)
+                released = self._folders_of((AnimationType.HEIXIU,))
+            
+            # 新模式下用不到的动画帧立即释放，需要时再重新加载
+            self.resource_manager.release(released)
         except Exception as e:
-            print(f"切换嘿咻模式失败: {e}")
+            logger.warning("切换嘿咻模式失败: %s", e)
     
     # 事件处理
     def mousePressEvent(self, event):
@@ -922,166 +1493,263 @@ class DesktopPet(QWidget):
         if self.is_force_sleeping:
             return
         
-        try:
-            self.last_interaction_time = time.time()
-            
-            if event.button() == Qt.LeftButton:
-                self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
-                self.mouse_press_pos = event.pos()
-                event.accept()
-        except Exception as e:
-            print(f"鼠标按下事件处理失败: {e}")
+        self.last_interaction_time = self._now()
+        
+        if event.button() == _LEFT:
+            self._frame_top_left = self.frameGeometry().topLeft()
+            self.drag_position = event.globalPos() - self._frame_top_left
+            self.mouse_press_pos = event.pos()
+            event.accept()
     
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
         if self.is_force_sleeping:
             return
         
-        try:
-            self.last_interaction_time = time.time()
-            
-            if event.buttons() == Qt.LeftButton and self.drag_position:
-                self.move(event.globalPos() - self.drag_position)
-                event.accept()
-        except Exception as e:
-            print(f"鼠标移动事件处理失败: {e}")
+        if self.drag_position is None:
+            return
+        
+        self.last_interaction_time = self._now()
+        if event.buttons() & _LEFT:
+            # 合并连续的移动事件，每轮事件循环最多移动一次窗口
+            self._pending_move_pos = event.globalPos() - self.drag_position
+            if not self._move_pending:
+                self._move_pending = True
+                QTimer.singleShot(0, self._flush_move)
+    
+    def _flush_move(self):
+        """执行合并后的窗口移动"""
+        if not self._move_pending:
+            return
+        self._move_pending = False
+        self._move(self._pending_move_pos)
     
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
         if self.is_force_sleeping:
             return
         
-        try:
-            self.last_interaction_time = time.time()
+        self.last_interaction_time = self._now()
+        
+        # 先完成尚未执行的拖拽移动
+        self._flush_move()
+        
+        if event.button() == _LEFT:
+            # 处理睡眠状态唤醒
+            if self._is_sleeping():
+                self._wake_up()
+                event.accept()
+                return
             
-            if event.button() == Qt.LeftButton:
-                # 处理睡眠状态唤醒
-                if self._is_sleeping():
-                    self._wake_up()
-                    event.accept()
-                    return
+            # 处理点击事件（按下与释放位置的曼哈顿距离小于5视为单击）
+            press_pos = self.mouse_press_pos
+            release_pos = event.pos()
+            if (press_pos is not None and
+                abs(release_pos.x() - press_pos.x()) + abs(release_pos.y() - press_pos.y()) < 5):
                 
-                # 处理点击事件
-                if (self.mouse_press_pos and 
-                    (event.pos() - self.mouse_press_pos).manhattanLength() < 5):
+                if self.is_heixiu_mode:
+                    self._start_animation(self._A_HEIXIU)
+                else:
+                    # 随机动作
+                    r = self._rand()
+                    for threshold, animation_type in _CLICK_TABLE:
+                        if r < threshold:
+                            self._start_animation(animation_type)
+                            break
                     
-                    if self.is_heixiu_mode:
-                        self._start_animation(AnimationType.HEIXIU)
-                    else:
-                        # 随机动作
-                        rand_val = random.randint(1, 100)
-                        if rand_val < 10:
-                            self._start_animation(AnimationType.SHAKE)
-                        elif rand_val < 20:
-                            self._start_animation(AnimationType.CONFUSED)
-                        else:
-                            self._start_animation(AnimationType.BLINK)
-                        
-                        self._check_anger_condition()
-                
-                self.mouse_press_pos = None
-                self.drag_position = None
-                event.accept()
-        except Exception as e:
-            print(f"鼠标释放事件处理失败: {e}")
+                    self._check_anger_condition()
+            
+            self.mouse_press_pos = None
+            self.drag_position = None
+            event.accept()
     
     def contextMenuEvent(self, event):
         """右键菜单事件"""
         if self.is_force_sleeping:
             return
         
-        try:
-            self.last_interaction_time = time.time()
-            menu = self._create_context_menu()
-            if menu:
-                menu.exec_(event.globalPos())
-        except Exception as e:
-            print(f"右键菜单事件处理失败: {e}")
+        self.last_interaction_time = self._now()
+        menu = self._menu_free_active if self.free_active_type else self._menu_default
+        if menu is None:
+            return
+        
+        # 菜单只创建一次，这里仅刷新随模式变化的部分
+        if menu is self._menu_default:
+            self._heixiu_action.setText("关闭嘿咻模式" if self.is_heixiu_mode else "开启嘿咻模式")
+            self._interaction_menu.menuAction().setVisible(not self.is_heixiu_mode)
+        menu.exec_(event.globalPos())
     
-    def _create_context_menu(self) -> QMenu:
-        """创建右键菜单"""
+    def _create_context_menu(self):
+        """创建右键菜单（普通菜单和自由活动菜单各一个，之后复用）"""
+        self._menu_default = None
+        self._menu_free_active = None
         try:
-            menu = QMenu(self)
+            free_active_menu = QMenu(self)
+            free_active_menu.addAction("退出自由活动", self._end_free_active)
+            free_active_menu.addAction("退出", self.close)
             
-            if self.free_active_type:
-                menu.addAction("退出自由活动", self._end_free_active)
-                menu.addAction("退出", self.close)
-                return menu
+            menu = QMenu(self)
             
             # 动画速度子菜单
             speed_menu = menu.addMenu("动画速度")
-            speed_menu.addAction("慢速 (200ms)", lambda: self._set_main_timer_speed(200))
-            speed_menu.addAction("正常 (100ms)", lambda: self._set_main_timer_speed(100))
-            speed_menu.addAction("快速 (50ms)", lambda: self._set_main_timer_speed(50))
+            speed_menu.addAction("慢速 (200ms)", self._set_slow_speed)
+            speed_menu.addAction("正常 (100ms)", self._set_normal_speed)
+            speed_menu.addAction("快速 (50ms)", self._set_fast_speed)
             
             # 基本动作菜单
             menu.addAction("重新播放", self._restart_animation)
             menu.addAction("自由活动", self.start_free_active)
             
-            heixiu_text = "关闭嘿咻模式" if self.is_heixiu_mode else "开启嘿咻模式"
-            menu.addAction(heixiu_text, self.toggle_heixiu_mode)
+            self._heixiu_action = menu.addAction("开启嘿咻模式", self.toggle_heixiu_mode)
             
-            # 互动菜单
-            if not self.is_heixiu_mode:
-                interaction_menu = menu.addMenu("互动动作")
-                interaction_menu.addAction("喝奶", lambda: self._start_animation(AnimationType.DRINK_MILK))
-                interaction_menu.addAction("吃汉堡", lambda: self._start_animation(AnimationType.EAT_BURGER))
-                interaction_menu.addAction("吃鸡腿", lambda: self._start_animation(AnimationType.EAT_CHICKEN))
-                interaction_menu.addAction("摇摆", lambda: self._start_animation(AnimationType.SHAKE))
-                interaction_menu.addAction("滚动", lambda: self._start_animation(AnimationType.ROLL))
-                interaction_menu.addAction("弹吉他", lambda: self._start_animation(AnimationType.GUITAR))
-                interaction_menu.addAction("玩嘿咻", lambda: self._start_animation(AnimationType.PLAY_HEIXIU))
+            # 互动菜单（嘿咻模式下隐藏）
+            interaction_menu = menu.addMenu("互动动作")
+            interaction_menu.addAction("喝奶", self._start_drink_milk)
+            interaction_menu.addAction("吃汉堡", self._start_eat_burger)
+            interaction_menu.addAction("吃鸡腿", self._start_eat_chicken)
+            interaction_menu.addAction("摇摆", self._start_shake)
+            interaction_menu.addAction("滚动", self._start_roll)
+            interaction_menu.addAction("弹吉他", self._start_guitar)
+            interaction_menu.addAction("玩嘿咻", self._start_play_heixiu)
+            self._interaction_menu = interaction_menu
             
             menu.addSeparator()
             menu.addAction("退出", self.close)
             
-            return menu
+            self._menu_default = menu
+            self._menu_free_active = free_active_menu
         except Exception as e:
-            print(f"创建右键菜单失败: {e}")
-            return None
+            logger.warning("创建右键菜单失败: %s", e)
+    
+    # 菜单动作
+    @pyqtSlot()
+    def _start_drink_milk(self):
+        """喝奶"""
+        self._start_animation(AnimationType.DRINK_MILK)
+    
+    @pyqtSlot()
+    def _start_eat_burger(self):
+        """吃汉堡"""
+        self._start_animation(AnimationType.EAT_BURGER)
+    
+    @pyqtSlot()
+    def _start_eat_chicken(self):
+        """吃鸡腿"""
+        self._start_animation(AnimationType.EAT_CHICKEN)
+    
+    @pyqtSlot()
+    def _start_shake(self):
+        """摇摆"""
+        self._start_animation(AnimationType.SHAKE)
+    
+    @pyqtSlot()
+    def _start_roll(self):
+        """滚动"""
+        self._start_animation(AnimationType.ROLL)
+    
+    @pyqtSlot()
+    def _start_guitar(self):
+        """弹吉他"""
+        self._start_animation(AnimationType.GUITAR)
+    
+    @pyqtSlot()
+    def _start_play_heixiu(self):
+        """玩嘿咻"""
+        self._start_animation(AnimationType.PLAY_HEIXIU)
+    
+    @pyqtSlot()
+    def _set_slow_speed(self):
+        """慢速"""
+        self._set_main_timer_speed(200)
+    
+    @pyqtSlot()
+    def _set_normal_speed(self):
+        """正常速度"""
+        self._set_main_timer_speed(100)
+    
+    @pyqtSlot()
+    def _set_fast_speed(self):
+        """快速"""
+        self._set_main_timer_speed(50)
     
     def _set_main_timer_speed(self, speed: int):
         """设置主定时器速度"""
         try:
-            self.main_timer.stop()
-            self.main_timer.start(speed)
+            self._main_ticks = self._ticks_for(speed)
         except Exception as e:
-            print(f"设置定时器速度失败: {e}")
+            logger.warning("设置定时器速度失败: %s", e)
     
     def _restart_animation(self):
         """重启动画"""
         try:
-            self._stop_current_animation()
-            self.animation_state.reset()
-            self.is_heixiu_mode = False
-            self.free_active_type = None
-            self.last_interaction_time = time.time()
+            state = self.animation_state
+            already_idle = (state.current_animation is None and state.current_index == 0
+                            and not self.is_heixiu_mode and self.free_active_type is None)
             
-            # 恢复原始尺寸
-            self.resize(self.original_size)
-            self.image_label.setGeometry(0, 0, self.original_size.width(), self.original_size.height())
+            # 已经处于初始空闲状态时无需再停止和重置
+            if not already_idle:
+                self._reset_to_idle(frame_index=0)
+            elif self._first_frame is not None:
+                self.image_label.setPixmap(self._first_frame)
+            self._clear_modes()
             
-            if self.main_frames:
-                self.image_label.setPixmap(self.main_frames[0])
-            
-            self.main_timer.start(100)
+            self._set_main_timer_speed(100)
         except Exception as e:
-            print(f"重启动画失败: {e}")
+            logger.warning("重启动画失败: %s", e)
+    
+    def showEvent(self, event):
+        """窗口显示时恢复主节拍"""
+        super().showEvent(event)
+        self._resume_ticks()
+    
+    def hideEvent(self, event):
+        """窗口隐藏时暂停主节拍，不再进行无用的重绘"""
+        super().hideEvent(event)
+        self._pause_ticks()
+    
+    def changeEvent(self, event):
+        """窗口最小化时暂停主节拍，还原后恢复"""
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            if self.isMinimized():
+                self._pause_ticks()
+            else:
+                self._resume_ticks()
+    
+    def _pause_ticks(self):
+        """暂停主节拍和后台系统监控"""
+        timer = getattr(self, 'animation_timer', None)
+        if timer is not None:
+            timer.stop()
+        monitor = getattr(self, 'system_monitor', None)
+        if monitor is not None:
+            monitor.pause()
+    
+    def _resume_ticks(self):
+        """恢复主节拍和后台系统监控"""
+        timer = getattr(self, 'animation_timer', None)
+        if timer is not None:
+            self._restart_timer(timer, self.TICK_INTERVAL)
+        monitor = getattr(self, 'system_monitor', None)
+        if monitor is not None:
+            monitor.resume()
+    
+    @staticmethod
+    def _restart_timer(timer: QTimer, interval: int):
+        """以指定间隔运行定时器，已按该间隔运行时不重复重置"""
+        if not timer.isActive() or timer.interval() != interval:
+            timer.start(interval)
     
     def closeEvent(self, event):
         """窗口关闭事件"""
         try:
-            # 停止所有定时器
-            if hasattr(self, 'main_timer'):
-                self.main_timer.stop()
+            # 停止主节拍定时器
             if hasattr(self, 'animation_timer'):
                 self.animation_timer.stop()
-            if hasattr(self, 'free_active_timer'):
-                self.free_active_timer.stop()
-            if hasattr(self, 'status_timer'):
-                self.status_timer.stop()
-            if hasattr(self, 'idle_timer'):
-                self.idle_timer.stop()
+            
+            # 停止系统监控线程
+            if hasattr(self, 'system_monitor'):
+                self.system_monitor.stop()
             
             # 停止音频播放
             if self.media_player and self.media_player.state() == QMediaPlayer.PlayingState:
@@ -1093,41 +1761,144 @@ class DesktopPet(QWidget):
             
             event.accept()
         except Exception as e:
-            print(f"关闭事件处理失败: {e}")
+            logger.warning("关闭事件处理失败: %s", e)
             event.accept()
 
 
+# 单实例锁文件描述符，进程存活期间保持打开
+_instance_lock_fd: Optional[int] = None
+
+
+def _try_lock(fd: int) -> bool:
+    """对文件加非阻塞独占锁，已被其他进程锁定时返回False"""
+    try:
+        if sys.platform == 'win32':
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def acquire_instance_lock(lock_file_path: str) -> bool:
+    """获取单实例锁，成功返回True
+    
+    锁由操作系统持有（Windows 用 msvcrt.locking，其他平台用 fcntl.lockf），
+    进程以任何方式退出（包括被强制结束）都会自动释放，不会遗留阻止启动的锁。
+    锁文件本身不删除：删除后重新创建的文件可能被另一个进程同时加锁。
+    """
+    global _instance_lock_fd
+    try:
+        fd = os.open(lock_file_path, os.O_CREAT | os.O_RDWR, 0o600)
+    except OSError:
+        return False
+    
+    if not _try_lock(fd):
+        os.close(fd)
+        return False
+    
+    # 写入进程号便于排查
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _instance_lock_fd = fd
+    return True
+
+
+class DuplicateMessageFilter(logging.Filter):
+    """丢弃短时间内重复出现的相同日志，避免异常以事件频率刷屏"""
+    MAX_KEYS = 64  # 超过该数量时清理过期记录
+    
+    def __init__(self, interval: float = 1.0):
+        super().__init__()
+        self.interval = interval
+        self._last_seen: Dict[Tuple[int, str], float] = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.getMessage())
+        now = time.monotonic()
+        last = self._last_seen.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+        if len(self._last_seen) >= self.MAX_KEYS:
+            self._last_seen = {
+                k: seen for k, seen in self._last_seen.items() if now - seen < self.interval
+            }
+        self._last_seen[key] = now
+        return True
+
+
+_LOG_FORMATTER = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+
+
+def setup_logging():
+    """配置日志级别和过滤器，有控制台时输出到控制台"""
+    logger.setLevel(logging.INFO)
+    logger.addFilter(DuplicateMessageFilter())
+    
+    # 无控制台打包（--noconsole）时 sys.stderr 为 None
+    if sys.stderr is not None:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_LOG_FORMATTER)
+        logger.addHandler(console_handler)
+
+
+def add_log_file(log_file_path: str):
+    """经内存缓冲写入滚动日志文件
+    
+    缓冲只合并 INFO 级别的记录，警告及以上立即写入文件，
+    避免进程被强制结束时丢失诊断信息。
+    """
+    try:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file_path, maxBytes=1024 * 1024, backupCount=1, encoding='utf-8'
+        )
+        file_handler.setFormatter(_LOG_FORMATTER)
+        logger.addHandler(logging.handlers.MemoryHandler(
+            capacity=100, flushLevel=logging.WARNING, target=file_handler
+        ))
+    except OSError as e:
+        logger.warning("无法创建日志文件 %s: %s", log_file_path, e)
+
+
+def install_exception_hook():
+    """安装全局异常钩子
+    
+    事件处理函数中未捕获的异常会写入日志（重复的异常由日志过滤器限速），
+    同时避免PyQt因未处理的异常直接终止程序。
+    """
+    def hook(exc_type, exc_value, exc_tb):
+        if issubclass(exc_type, KeyboardInterrupt):
+            sys.__excepthook__(exc_type, exc_value, exc_tb)
+            return
+        logger.warning("未处理的异常: %s", exc_value, exc_info=(exc_type, exc_value, exc_tb))
+    
+    sys.excepthook = hook
+
+
 def main():
     """主函数 - 添加异常处理和优雅启动"""
     try:
         app = QApplication(sys.argv)
         app.setQuitOnLastWindowClosed(True)
+        setup_logging()
+        install_exception_hook()
         
-        # 检查是否已有实例在运行（简单检查）
-        import tempfile
-        import fcntl
-        import os
-        
+        # 检查是否已有实例在运行
         lock_file_path = os.path.join(tempfile.gettempdir(), 'desktop_pet.lock')
-        try:
-            lock_file = open(lock_file_path, 'w')
-            fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
-        except (IOError, OSError):
-            print("桌面宠物已在运行中")
+        if not acquire_instance_lock(lock_file_path):
+            logger.info("桌面宠物已在运行中")
             return
         
-        pet = DesktopPet()
+        # 获得单实例锁后才打开日志文件，避免第二个实例占用日志文件
+        add_log_file(os.path.join(tempfile.gettempdir(), 'desktop_pet.log'))
         
-        # 如果初始化失败，显示错误信息
-        if not pet.main_frames:
-            print("警告: 未能加载主要资源文件，请检查资源目录")
+        pet = DesktopPet()
         
         sys.exit(app.exec_())
         
     except Exception as e:
-        print(f"程序启动失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("程序启动失败: %s", e)
 
 
 if __name__ == '__main__':